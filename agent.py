@@ -3,15 +3,20 @@ from langchain_core.runnables import RunnableConfig
 from typing import Dict
 
 class ShoppingAssistant:
-    def __init__(self, runnable):
+    def __init__(self, runnable, payload_store=None):
         self.runnable = runnable
+        self.payload_store = payload_store
 
     def __call__(self, state: Dict, config: RunnableConfig):
         while True:
             configuration = config.get("configurable", {})
             passenger_id = configuration.get("user_id", None)
             state = {**state, "user_info": passenger_id}
-            result = self.runnable.invoke(state)
+            # В состоянии графа лежат ссылки на результаты инструментов, модель получает их целиком
+            if self.payload_store is not None:
+                result = self.runnable.invoke({**state, "messages": self.payload_store.rehydrate_all(state["messages"])})
+            else:
+                result = self.runnable.invoke(state)
             
             # Re-prompt if the result is empty
             if not result.tool_calls and (
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import tools
+from inventory import get_inventory, reset_inventory
+
+HOT_SKUS = 5
+THREADS = 8
+OPS_PER_THREAD = 500
+
+
+def make_db(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, stock INTEGER)")
+    conn.execute("CREATE TABLE cart (user_id TEXT, product_id INTEGER, quantity INTEGER, PRIMARY KEY (user_id, product_id))")
+    conn.executemany("INSERT INTO products (id, stock) VALUES (?, ?)", [(i, 10 ** 9) for i in range(1, HOT_SKUS + 1)])
+    conn.commit()
+    conn.close()
+
+
+def direct_add_to_cart(db_path: str, user_id: str, product_id: int, quantity: int = 1) -> bool:
+    # Прежний add_to_cart: чтение остатка и корзины, проверка и запись обеих таблиц в отдельной транзакции
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        stock = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+        row = conn.execute("SELECT quantity FROM cart WHERE user_id = ? AND product_id = ?", (user_id, product_id)).fetchone()
+        new_quantity = (row[0] if row else 0) + quantity
+        if stock < new_quantity:
+            return False
+        if row:
+            conn.execute("UPDATE cart SET quantity = ? WHERE user_id = ? AND product_id = ?", (new_quantity, user_id, product_id))
+        else:
+            conn.execute("INSERT INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)", (user_id, product_id, quantity))
+        conn.execute("UPDATE products SET stock = ? WHERE id = ?", (stock - quantity, product_id))
+        conn.commit()
+        conn.execute("SELECT product_id, quantity FROM cart WHERE user_id = ?", (user_id,)).fetchall()
+        return True
+    finally:
+        conn.close()
+
+
+def totals(db_path: str):
+    """Суммарный остаток и суммарное количество в корзинах."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return (
+            conn.execute("SELECT SUM(stock) FROM products").fetchone()[0],
+            conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM cart").fetchone()[0],
+        )
+    finally:
+        conn.close()
+
+
+def lost_updates(before, after) -> int:
+    """Операции, не дошедшие до базы: списание остатка или строка корзины потеряны."""
+    operations = THREADS * OPS_PER_THREAD
+    return max(operations - (before[0] - after[0]), operations - (after[1] - before[1]))
+
+
+def run_threads(worker) -> float:
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return THREADS * OPS_PER_THREAD / (time.perf_counter() - start)
+
+
+def main():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # Инструмент работает с базой и журналом остатков в текущем каталоге
+        os.chdir(directory)
+        try:
+            db_path = tools.db = "bench.sqlite"
+            make_db(db_path)
+
+            def direct_worker(n):
+                for i in range(OPS_PER_THREAD):
+                    direct_add_to_cart(db_path, f"direct-{n}", i % HOT_SKUS + 1)
+
+            before = totals(db_path)
+            direct_ops = run_threads(direct_worker)
+            # Чтение-проверка-запись без блокировки теряет обновления при конкурентных вызовах
+            direct_lost = lost_updates(before, totals(db_path))
+
+            def tool_worker(n):
+                config = {"configurable": {"thread_id": f"tool-{n}"}}
+                for i in range(OPS_PER_THREAD):
+                    tools.add_to_cart.func(config, i % HOT_SKUS + 1)
+
+            # Тело инструмента без обёртки LangChain: сравнимо с прямым SQL один к одному
+            before = totals(db_path)
+            tool_ops = run_threads(tool_worker)
+            get_inventory(db_path).flush()
+            tool_lost = lost_updates(before, totals(db_path))
+
+            def invoke_worker(n):
+                config = {"configurable": {"thread_id": f"invoke-{n}"}}
+                for i in range(OPS_PER_THREAD):
+                    tools.add_to_cart.invoke({"product_id": i % HOT_SKUS + 1}, config=config)
+
+            # Вызов так, как его делает граф: валидация аргументов и колбэки LangChain на каждый вызов
+            before = totals(db_path)
+            invoke_ops = run_threads(invoke_worker)
+            get_inventory(db_path).flush()
+            invoke_lost = lost_updates(before, totals(db_path))
+            reset_inventory(db_path)
+        finally:
+            os.chdir(cwd)
+
+    print(f"{THREADS} потоков, {HOT_SKUS} горячих товаров, {THREADS * OPS_PER_THREAD} вызовов add_to_cart на путь")
+    print(f"  прежний add_to_cart (SQL):   {direct_ops:10.0f} ops/s, потеряно обновлений: {direct_lost}")
+    print(f"  add_to_cart:                 {tool_ops:10.0f} ops/s, потеряно обновлений: {tool_lost} ({tool_ops / direct_ops:.1f}x)")
+    print(f"  add_to_cart.invoke:          {invoke_ops:10.0f} ops/s, потеряно обновлений: {invoke_lost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import random
+import time
+
+from wardrobe import SLOT_KEYWORDS, optimize_outfit
+
+
+def make_candidates(per_slot: int, seed: int = 0):
+    rng = random.Random(seed)
+    return {
+        slot: [
+            {"id": i, "title": f"{slot} {i}", "price": round(rng.uniform(200, 5000), 2), "rating": round(rng.uniform(1, 5), 1)}
+            for i in range(per_slot)
+        ]
+        for slot in SLOT_KEYWORDS
+    }
+
+
+def bench(per_slot: int, max_price: float, repeats: int = 20):
+    candidates = make_candidates(per_slot)
+    optimize_outfit(candidates, max_price)  # прогрев
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = optimize_outfit(candidates, max_price)
+    elapsed_ms = (time.perf_counter() - start) / repeats * 1000
+    print(f"{per_slot:>6} кандидатов на слот, бюджет {max_price:>7}: {elapsed_ms:7.2f} ms, "
+          f"рейтинг {result['total_rating'] if result else '-'}, сумма {result['total_price'] if result else '-'}")
+    return elapsed_ms
+
+
+if __name__ == "__main__":
+    for per_slot in (100, 1000, 5000, 20000):
+        for max_price in (3000, 10000):
+            assert bench(per_slot, max_price) < 100, "оптимизатор медленнее 100 мс"
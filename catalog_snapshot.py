@@ -0,0 +1,252 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from wardrobe import classify_slot, title_gender
+
+SNAPSHOT_DIR = "catalog_snapshot"
+# Файл-указатель на текущую версию снимка внутри SNAPSHOT_DIR
+CURRENT_FILE = "CURRENT"
+
+# Колонки снимка: имя в снимке -> выражение в SQLite.
+# Числовые колонки хранятся как float64, категориальные — как коды int32 со словарём значений.
+TABLE_SPECS = {
+    "products": {
+        "numeric": {
+            "price": "price",
+            "rating": "rating",
+            "discount": "discountPercentage",
+            "stock": "stock",
+        },
+        "categorical": {
+            "brand": "brand",
+            "category": "category",
+        },
+        # Производные категориальные колонки, вычисляемые из названия товара
+        "derived": {
+            "gender": title_gender,
+            "slot": lambda title: classify_slot(title) or "",
+        },
+    },
+    "cosmetics": {
+        "numeric": {
+            "price": "price_usd",
+            "rating": "rating",
+        },
+        "categorical": {
+            "brand": "brand",
+            "category": "category",
+            "skin_type": "skin_type",
+            "gender": "gender_target",
+        },
+        "derived": {},
+    },
+}
+
+
+def _table_columns(cursor, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1].lower() for row in cursor.fetchall()]
+
+
+def _catalog_version(cursor) -> Optional[str]:
+    try:
+        row = cursor.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def build_snapshot(db_path: str, directory: str = SNAPSHOT_DIR) -> Dict[str, int]:
+    """Строит колоночный снимок каталога в новом каталоге версии и переключает на него указатель.
+
+    Переключение — атомарная замена файла CURRENT, поэтому читатели всегда
+    видят либо старую, либо новую версию. Старые версии удаляются, если
+    их файлы никто не держит отображёнными в память (на Windows они
+    остаются до следующей сборки). Возвращает число строк в каждой
+    выгруженной таблице; отсутствующие в базе таблицы и колонки пропускаются.
+    В манифест записывается версия каталога, по которой get_snapshot
+    отличает снимок от базы, пересобранной после него.
+    """
+    version = f"v{time.time_ns()}"
+    version_directory = os.path.join(directory, version)
+    os.makedirs(version_directory)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    manifest = {"catalog_version": _catalog_version(cursor), "tables": {}}
+    try:
+        for table, spec in TABLE_SPECS.items():
+            existing = set(_table_columns(cursor, table))
+            if not existing:
+                continue
+            numeric = {name: expr for name, expr in spec["numeric"].items() if expr.lower() in existing}
+            categorical = {name: expr for name, expr in spec["categorical"].items() if expr.lower() in existing}
+            derived = spec["derived"] if "title" in existing else {}
+
+            expressions = ["rowid"] + list(numeric.values()) + list(categorical.values())
+            if derived:
+                expressions.append("title")
+            cursor.execute(f"SELECT {', '.join(expressions)} FROM {table} ORDER BY rowid")
+            rows = cursor.fetchall()
+            columns = list(zip(*rows)) if rows else [()] * len(expressions)
+
+            table_dir = os.path.join(version_directory, table)
+            os.makedirs(table_dir)
+            np.save(os.path.join(table_dir, "rowid.npy"), np.asarray(columns[0], dtype=np.int64))
+
+            offset = 1
+            for name in numeric:
+                values = np.array([np.nan if v is None else v for v in columns[offset]], dtype=np.float64)
+                np.save(os.path.join(table_dir, f"{name}.npy"), values)
+                offset += 1
+
+            raw_categorical = {}
+            for name in categorical:
+                raw_categorical[name] = columns[offset]
+                offset += 1
+            for name, func in derived.items():
+                raw_categorical[name] = [func(title) for title in columns[offset]]
+
+            vocabularies = {}
+            for name, values in raw_categorical.items():
+                vocabulary, codes = np.unique(np.array(["" if v is None else str(v) for v in values], dtype=object), return_inverse=True)
+                np.save(os.path.join(table_dir, f"{name}.npy"), codes.astype(np.int32))
+                vocabularies[name] = [str(v) for v in vocabulary]
+
+            manifest["tables"][table] = {
+                "rows": len(rows),
+                "numeric": list(numeric),
+                "categorical": vocabularies,
+            }
+    finally:
+        conn.close()
+
+    with open(os.path.join(version_directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    pointer_tmp = os.path.join(directory, f"{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name != version and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    return {table: info["rows"] for table, info in manifest["tables"].items()}
+
+
+class ColumnarTable:
+    """Одна таблица снимка: memory-mapped массивы и словари категориальных значений."""
+
+    def __init__(self, directory: str, info: Dict):
+        self.rows = info["rows"]
+        self.rowid = np.load(os.path.join(directory, "rowid.npy"), mmap_mode="r")
+        self.numeric = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in info["numeric"]}
+        self.codes = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in info["categorical"]}
+        self.vocabularies = {name: {value: code for code, value in enumerate(vocabulary)} for name, vocabulary in info["categorical"].items()}
+
+    def mask(
+        self,
+        equals: Optional[Dict[str, Iterable[str]]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+    ) -> np.ndarray:
+        """Булева маска строк: categorical in {значения} и lo <= numeric <= hi."""
+        mask = np.ones(self.rows, dtype=bool)
+        for name, values in (equals or {}).items():
+            if isinstance(values, str):
+                values = [values]
+            vocabulary = self.vocabularies[name]
+            codes = [vocabulary[value] for value in values if value in vocabulary]
+            mask &= np.isin(self.codes[name], codes)
+        for name, (low, high) in (ranges or {}).items():
+            column = self.numeric[name]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        return mask
+
+    def top_k(self, mask: np.ndarray, order_by: str, k: int, descending: bool = False) -> np.ndarray:
+        """rowid первых k строк под маской, упорядоченных по числовой колонке."""
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        keys = np.asarray(self.numeric[order_by][candidates])
+        keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+        if candidates.size > k:
+            part = np.argpartition(keys, k - 1)[:k]
+        else:
+            part = np.arange(candidates.size)
+        # Устойчивая сортировка сохраняет порядок rowid среди равных значений, как в SQLite
+        part = part[np.lexsort((candidates[part], keys[part]))]
+        return np.asarray(self.rowid[candidates[part]])
+
+
+class CatalogSnapshot:
+    """Колоночный снимок только для чтения, построенный build_snapshot."""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.tables = {
+            table: ColumnarTable(os.path.join(directory, table), info)
+            for table, info in self.manifest["tables"].items()
+        }
+
+    def table(self, name: str) -> Optional[ColumnarTable]:
+        return self.tables.get(name)
+
+
+_snapshot_cache: Dict[str, Tuple[str, CatalogSnapshot]] = {}
+
+
+def invalidate_snapshot(directory: str = SNAPSHOT_DIR):
+    """Снимает указатель CURRENT перед пересборкой базы: rowid старого снимка больше не соответствуют товарам."""
+    try:
+        os.remove(os.path.join(directory, CURRENT_FILE))
+    except FileNotFoundError:
+        pass
+    _snapshot_cache.pop(directory, None)
+
+
+def get_snapshot(cursor, directory: str = SNAPSHOT_DIR) -> Optional[CatalogSnapshot]:
+    """Возвращает загруженный снимок или None, если он не построен или построен для другой версии каталога.
+
+    Версия каталога читается через cursor открытого соединения с базой.
+    Снимок перечитывается, только когда build_snapshot переключил CURRENT на новую версию.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    cached = _snapshot_cache.get(directory)
+    if cached and cached[0] == version:
+        snapshot = cached[1]
+    else:
+        snapshot = CatalogSnapshot(os.path.join(directory, version))
+        _snapshot_cache[directory] = (version, snapshot)
+    catalog_version = snapshot.manifest.get("catalog_version")
+    if catalog_version is None or catalog_version != _catalog_version(cursor):
+        return None
+    return snapshot
+
+
+def fetch_rows(cursor, table: str, columns: List[str], rowids: Iterable[int]) -> List[Dict]:
+    """Дочитывает из SQLite полные строки для rowid, найденных по снимку, сохраняя их порядок."""
+    rowids = [int(rowid) for rowid in rowids]
+    if not rowids:
+        return []
+    cursor.execute(
+        f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid IN ({', '.join('?' * len(rowids))})",
+        rowids,
+    )
+    by_rowid = {row[0]: dict(zip(columns, row[1:])) for row in cursor.fetchall()}
+    return [by_rowid[rowid] for rowid in rowids if rowid in by_rowid]
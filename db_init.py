@@ -1,10 +1,67 @@
+import glob
+import os
 import sqlite3
 import json
+from inventory import WAL_PATH, reset_inventory
+from resolver import invalidate_resolvers
 
-def init_database():
+DB_PATH = 'shopping_assistant.sqlite'
+SOURCE_PATH = r'C:\Users\Huawei\Shopping-Assistant-with-LangGraph\flipkart_fashion_products_dataset.json'
+
+def source_fingerprint(source_path=SOURCE_PATH):
+    """Отпечаток исходного файла каталога (размер и время изменения) или None, если файла нет."""
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def catalog_version(db_path=DB_PATH):
+    """Версия каталога, записанная при последней сборке базы, или None."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def is_database_current(db_path=DB_PATH, source_path=SOURCE_PATH):
+    """База актуальна, если собрана из текущей версии исходного файла.
+
+    Если исходного файла нет, пересобрать базу всё равно нельзя, поэтому
+    достаточно того, что она уже была собрана.
+    """
+    version = catalog_version(db_path)
+    if version is None:
+        return False
+    fingerprint = source_fingerprint(source_path)
+    return fingerprint is None or version == fingerprint
+
+def build_situation_index(cursor):
+    """Заполняет таблицу тегов ситуаций по ключевым словам в названии и описании товаров."""
+    # numpy-зависимые модули импортируются только при пересборке, чтобы не замедлять запуск
+    from wardrobe import SITUATION_KEYWORDS
+
+    cursor.execute("DELETE FROM product_situations")
+    for tag, keywords in SITUATION_KEYWORDS.items():
+        for keyword in keywords:
+            cursor.execute('''
+                INSERT OR IGNORE INTO product_situations (tag, category, product_id)
+                SELECT ?, COALESCE(category, ''), id FROM products
+                WHERE title LIKE ? OR description LIKE ?
+            ''', (tag, f"%{keyword}%", f"%{keyword}%"))
+
+def init_database(force=False):
+    if not force and is_database_current():
+        print("База данных актуальна, пересборка не требуется.")
+        return True
     try:
         # Чтение данных из JSON-файла
-        with open(r'C:\Users\Huawei\Shopping-Assistant-with-LangGraph\flipkart_fashion_products_dataset.json', 'r', encoding='utf-8') as f:
+        with open(SOURCE_PATH, 'r', encoding='utf-8') as f:
             products_data = json.load(f)
 
         # Подготовка данных для вставки
@@ -41,13 +98,26 @@ def init_database():
             except Exception as e:
                 print(f"Ошибка обработки продукта {product.get('pid')}: {e}")
 
+        # Резервы и журнал остатков относятся к старому каталогу: останавливаем сервис без сброса в базу
+        reset_inventory(DB_PATH)
+        for path in glob.glob(f"{glob.escape(WAL_PATH)}*"):
+            os.remove(path)
+
+        # rowid старого снимка после пересборки указывают на другие товары: до новой сборки инструменты работают через SQL
+        from catalog_snapshot import invalidate_snapshot
+        invalidate_snapshot()
+
         # Создание базы данных
-        conn = sqlite3.connect('shopping_assistant.sqlite')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
         # Удаление старых таблиц
         cursor.execute("DROP TABLE IF EXISTS products")
         cursor.execute("DROP TABLE IF EXISTS cart")
+        cursor.execute("DROP TABLE IF EXISTS product_situations")
+        cursor.execute("DROP TABLE IF EXISTS catalog_meta")
+        cursor.execute("DROP TABLE IF EXISTS stock_reservations")
+        cursor.execute("DROP TABLE IF EXISTS inventory_meta")
         
         # Создание новых таблиц
         cursor.execute('''
@@ -75,16 +145,41 @@ def init_database():
         )
         ''')
         
+        # Инвертированный индекс тегов: тег -> товары, сгруппированные по категории
+        cursor.execute('''
+        CREATE TABLE product_situations (
+            tag TEXT NOT NULL,
+            category TEXT,
+            product_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, category, product_id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX idx_product_situations_product ON product_situations (product_id)")
+        
         # Вставка данных
         cursor.executemany(''' 
             INSERT INTO products 
             (title, description, price, discountPercentage, rating, stock, brand, category, thumbnail) 
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) 
         ''', formatted_products)
+        build_situation_index(cursor)
+        
+        # Версия каталога позволяет пропускать пересборку при следующем запуске
+        cursor.execute("CREATE TABLE catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        cursor.execute("INSERT INTO catalog_meta (key, value) VALUES ('version', ?)", (source_fingerprint(),))
         
         conn.commit()
         conn.close()
+        invalidate_resolvers()
         print(f"База данных успешно инициализирована! Загружено {len(formatted_products)} записей.")
+        
+        # Колоночный снимок каталога необязателен: при ошибке инструменты работают через SQL
+        try:
+            from catalog_snapshot import build_snapshot
+            build_snapshot(DB_PATH)
+        except Exception as e:
+            print(f"Не удалось построить колоночный снимок каталога: {e}")
         return True
     
     except Exception as e:
@@ -92,4 +187,4 @@ def init_database():
         return False
 
 if __name__ == '__main__':
-    init_database()
\ No newline at end of file
+    init_database(force=True)
\ No newline at end of file
@@ -2,7 +2,8 @@ from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph, START
 from langgraph.prebuilt import tools_condition
 from agent import ShoppingAssistant
-from helper import create_tool_node_with_fallback
+from helper import create_offloading_tool_node, create_tool_node_with_fallback
+from payload_store import PayloadStore
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph.message import AnyMessage, add_messages
@@ -11,11 +12,12 @@ class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
 
 class ShoppingGraph:
-    def __init__(self, assistant_runnable, tools_no_confirmation, tools_need_confirmation):
+    def __init__(self, assistant_runnable, tools_no_confirmation, tools_need_confirmation, payload_store=None):
         self.assistant_runnable = assistant_runnable
         self.tools_no_confirmation = tools_no_confirmation
         self.tools_need_confirmation = tools_need_confirmation
         self.confirmation_tool_names = {t.name for t in tools_need_confirmation}
+        self.payload_store = payload_store or PayloadStore()  # Large tool results are kept out of checkpoints
         self.memory = MemorySaver()  # Initialize memory for state persistence
         self.graph = self._build_graph()
 
@@ -24,8 +26,8 @@ class ShoppingGraph:
         builder = StateGraph(State)
 
         # Add nodes to the graph
-        builder.add_node("assistant", ShoppingAssistant(self.assistant_runnable))
-        builder.add_node("tools_no_confirmation", create_tool_node_with_fallback(self.tools_no_confirmation))
+        builder.add_node("assistant", ShoppingAssistant(self.assistant_runnable, self.payload_store))
+        builder.add_node("tools_no_confirmation", create_offloading_tool_node(self.tools_no_confirmation, self.payload_store))
         builder.add_node("tools_need_confirmation", create_tool_node_with_fallback(self.tools_need_confirmation))
 
         # Define a function to route tool invocations
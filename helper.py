@@ -24,7 +24,18 @@ def create_tool_node_with_fallback(tools: list) -> dict:
     )
 
 
-def _print_event(event: dict, _printed: set, max_length=1500):
+def create_offloading_tool_node(tools: list, payload_store) -> RunnableLambda:
+    # Большие результаты инструментов сохраняются в payload_store, в состояние попадает ссылка
+    tool_node = create_tool_node_with_fallback(tools)
+
+    def run_tools(state, config):
+        result = tool_node.invoke(state, config)
+        return {"messages": [payload_store.offload(m) for m in result["messages"]]}
+
+    return RunnableLambda(run_tools)
+
+
+def _print_event(event: dict, _printed: set, max_length=1500, payload_store=None):
     current_state = event.get("dialog_state")
     if current_state:
         print("Currently in: ", current_state[-1])
@@ -33,6 +44,8 @@ def _print_event(event: dict, _printed: set, max_length=1500):
         if isinstance(message, list):
             message = message[-1]
         if message.id not in _printed:
+            if payload_store is not None:
+                message = payload_store.rehydrate(message)
             msg_repr = message.pretty_repr(html=True)
             if len(msg_repr) > max_length:
                 msg_repr = msg_repr[:max_length] + " ... (truncated)"
@@ -0,0 +1,339 @@
+import atexit
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+WAL_PATH = "inventory.wal"
+
+# Резерв товара в корзине действует RESERVATION_TTL секунд с последнего добавления
+RESERVATION_TTL = 30 * 60
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH_SIZE = 500
+
+
+class InventoryService:
+    """Счётчики остатков в памяти с резервированием и отложенной записью в SQLite.
+
+    reserve/release выполняются под одной блокировкой без обращения к SQLite
+    (кроме первой загрузки остатка товара). Каждая операция сначала
+    дописывается в журнал (WAL), затем применяется в памяти. Резерв
+    пользователя на товар и есть строка его корзины: фоновый поток пакетно
+    переносит изменения остатков, резервы и строки корзины в SQLite одной
+    транзакцией и запоминает номер последней применённой записи журнала,
+    поэтому повторное воспроизведение после сбоя идемпотентно. Актуальное
+    содержимое корзины отдаёт cart(). Рассчитано на один процесс, работающий с базой.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        wal_path: str = WAL_PATH,
+        reservation_ttl: float = RESERVATION_TTL,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_batch_size: int = FLUSH_BATCH_SIZE,
+        durable: bool = False,
+    ):
+        self.db_path = db_path
+        self.wal_path = wal_path
+        self.reservation_ttl = reservation_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        # durable=True вызывает fsync на каждую запись журнала (переживает отключение питания, но медленнее)
+        self.durable = durable
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stock: Dict[int, Optional[int]] = {}
+        self._deltas: Dict[int, int] = {}
+        self._reservations: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self._dirty_reservations = set()
+        self._pending = 0
+        self._seq = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Отдельное соединение для чтения остатков, чтобы не видеть незафиксированную транзакцию сброса
+        self._read_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_tables()
+        self._recover()
+        self._wal = open(wal_path, "a", encoding="utf-8")
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _create_tables(self):
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS stock_reservations (
+                user_id TEXT,
+                product_id INTEGER,
+                quantity INTEGER,
+                expires_at REAL,
+                PRIMARY KEY (user_id, product_id)
+            );
+            CREATE TABLE IF NOT EXISTS inventory_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS cart (
+                user_id TEXT,
+                product_id INTEGER,
+                quantity INTEGER,
+                PRIMARY KEY (user_id, product_id)
+            );
+        """)
+        self._conn.commit()
+
+    # --- Восстановление ---
+
+    def _wal_segments(self) -> List[str]:
+        return [path for path in glob.glob(f"{glob.escape(self.wal_path)}*") if not path.endswith(".tmp")]
+
+    def _recover(self):
+        """Загружает резервы из SQLite и воспроизводит записи журнала, ещё не перенесённые в базу."""
+        row = self._conn.execute("SELECT value FROM inventory_meta WHERE key = 'wal_seq'").fetchone()
+        applied_seq = row[0] if row else 0
+        self._seq = applied_seq
+        # Строки корзины, добавленные до появления сервиса (остаток по ним уже списан), становятся резервами
+        with self._conn:
+            self._conn.execute("""
+                INSERT INTO stock_reservations (user_id, product_id, quantity, expires_at)
+                SELECT user_id, product_id, quantity, ? FROM cart c
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM stock_reservations r WHERE r.user_id = c.user_id AND r.product_id = c.product_id
+                )
+            """, (time.time() + self.reservation_ttl,))
+        for user_id, product_id, quantity, expires_at in self._conn.execute(
+            "SELECT user_id, product_id, quantity, expires_at FROM stock_reservations"
+        ):
+            self._reservations[(user_id, product_id)] = (quantity, expires_at)
+
+        records = []
+        for path in self._wal_segments():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Оборванная последняя строка после сбоя
+                        continue
+        for record in sorted(records, key=lambda r: r["seq"]):
+            self._seq = max(self._seq, record["seq"])
+            if record["seq"] > applied_seq:
+                self._apply(record)
+
+        self.flush()
+        for path in self._wal_segments():
+            os.remove(path)
+
+    # --- Журнал и применение операций ---
+
+    def _apply(self, record: Dict):
+        key = (record["user_id"], record["product_id"])
+        product_id, quantity = record["product_id"], record["quantity"]
+        if record["op"] == "reserve":
+            reserved, _ = self._reservations.get(key, (0, 0.0))
+            self._reservations[key] = (reserved + quantity, record["expires_at"])
+            self._deltas[product_id] = self._deltas.get(product_id, 0) - quantity
+            if self._stock.get(product_id) is not None:
+                self._stock[product_id] -= quantity
+        else:
+            # release и expire возвращают резерв (целиком или частично) на склад
+            reserved, expires_at = self._reservations.pop(key, (0, 0.0))
+            if reserved > quantity:
+                self._reservations[key] = (reserved - quantity, expires_at)
+            self._deltas[product_id] = self._deltas.get(product_id, 0) + quantity
+            if self._stock.get(product_id) is not None:
+                self._stock[product_id] += quantity
+        self._dirty_reservations.add(key)
+        self._pending += 1
+
+    def _log(self, op: str, user_id: str, product_id: int, quantity: int, expires_at: float = 0.0):
+        """Записывает операцию в журнал и применяет её. Вызывается под self._lock."""
+        self._seq += 1
+        record = {"seq": self._seq, "op": op, "user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+        self._wal.write(json.dumps(record) + "\n")
+        self._wal.flush()
+        if self.durable:
+            os.fsync(self._wal.fileno())
+        self._apply(record)
+        if self._pending >= self.flush_batch_size:
+            self._wake.set()
+
+    def _load_stock(self, product_id: int) -> Optional[int]:
+        # Товар загружается до первой операции с ним и не выгружается, поэтому у незагруженных
+        # товаров нет ни накопленных, ни записываемых сейчас изменений
+        if product_id not in self._stock:
+            row = self._read_conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()
+            self._stock[product_id] = None if row is None else row[0] or 0
+        return self._stock[product_id]
+
+    # --- Публичные операции ---
+
+    def available(self, product_id: int) -> Optional[int]:
+        """Свободный остаток товара или None, если товара нет в каталоге."""
+        with self._lock:
+            return self._load_stock(product_id)
+
+    def cart(self, user_id: str) -> Dict[int, int]:
+        """Корзина пользователя: товар -> количество, включая ещё не записанные в базу изменения."""
+        with self._lock:
+            return {
+                product_id: quantity
+                for (owner, product_id), (quantity, _) in self._reservations.items()
+                if owner == user_id
+            }
+
+    def reserve(self, user_id: str, product_id: int, quantity: int = 1) -> Tuple[bool, Optional[int]]:
+        """Атомарно резервирует товар для корзины пользователя.
+
+        Возвращает (успех, свободный остаток после операции); остаток None,
+        если товара нет в каталоге. Срок резерва продлевается при каждом добавлении.
+        """
+        with self._lock:
+            stock = self._load_stock(product_id)
+            if stock is None or quantity <= 0 or stock < quantity:
+                return False, stock
+            self._log("reserve", user_id, product_id, quantity, time.time() + self.reservation_ttl)
+            return True, self._stock[product_id]
+
+    def release(self, user_id: str, product_id: int, quantity: Optional[int] = None) -> int:
+        """Снимает резерв пользователя на товар (весь или quantity единиц) и возвращает освобождённое количество."""
+        with self._lock:
+            reserved, _ = self._reservations.get((user_id, product_id), (0, 0.0))
+            released = reserved if quantity is None else min(quantity, reserved)
+            if released > 0:
+                self._load_stock(product_id)
+                self._log("release", user_id, product_id, released)
+            return released
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Снимает просроченные резервы вместе с позициями корзины."""
+        with self._lock:
+            return self._expire_locked(time.time() if now is None else now)
+
+    def _expire_locked(self, now: float) -> int:
+        expired = [(key, quantity) for key, (quantity, expires_at) in self._reservations.items() if expires_at <= now]
+        for (user_id, product_id), quantity in expired:
+            self._load_stock(product_id)
+            self._log("expire", user_id, product_id, quantity)
+        return len(expired)
+
+    # --- Отложенная запись ---
+
+    def flush(self):
+        """Переносит накопленные изменения в SQLite одной транзакцией."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                deltas, self._deltas = self._deltas, {}
+                dirty, self._dirty_reservations = self._dirty_reservations, set()
+                reservations = {key: self._reservations.get(key) for key in dirty}
+                seq, self._pending = self._seq, 0
+                # Новые записи пойдут в свежий сегмент журнала, старый удаляется после фиксации
+                # (при восстановлении журнал ещё не открыт, его сегменты удаляет _recover)
+                if getattr(self, "_wal", None) is not None:
+                    self._wal.close()
+                    os.replace(self.wal_path, f"{self.wal_path}.{seq}")
+                    self._wal = open(self.wal_path, "a", encoding="utf-8")
+
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE products SET stock = stock + ? WHERE id = ?",
+                        [(delta, product_id) for product_id, delta in deltas.items() if delta],
+                    )
+                    for (user_id, product_id), reservation in reservations.items():
+                        if reservation:
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO stock_reservations (user_id, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)",
+                                (user_id, product_id, *reservation),
+                            )
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)",
+                                (user_id, product_id, reservation[0]),
+                            )
+                        else:
+                            self._conn.execute(
+                                "DELETE FROM stock_reservations WHERE user_id = ? AND product_id = ?",
+                                (user_id, product_id),
+                            )
+                            self._conn.execute(
+                                "DELETE FROM cart WHERE user_id = ? AND product_id = ?",
+                                (user_id, product_id),
+                            )
+                    self._conn.execute("INSERT OR REPLACE INTO inventory_meta (key, value) VALUES ('wal_seq', ?)", (seq,))
+            except Exception:
+                # Возвращаем изменения в очередь; сегмент журнала остаётся до успешного сброса
+                with self._lock:
+                    for product_id, delta in deltas.items():
+                        self._deltas[product_id] = self._deltas.get(product_id, 0) + delta
+                    self._dirty_reservations |= dirty
+                    self._pending += len(dirty) or 1
+                raise
+
+            # Удаляем все сегменты, записи которых уже в базе, включая оставшиеся от неудачных сбросов
+            for path in self._wal_segments():
+                suffix = path[len(self.wal_path) + 1:]
+                if suffix.isdigit() and int(suffix) <= seq:
+                    os.remove(path)
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.expire()
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка записи остатков в базу: {e}")
+
+    def close(self):
+        """Останавливает фоновый поток и сбрасывает оставшиеся изменения."""
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        self._wal.close()
+        self._conn.close()
+        self._read_conn.close()
+
+    def discard(self):
+        """Останавливает сервис без сброса изменений и удаляет журнал (после пересборки базы он недействителен)."""
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join()
+        with self._flush_lock, self._lock:
+            self._wal.close()
+            self._conn.close()
+            self._read_conn.close()
+            for path in self._wal_segments():
+                os.remove(path)
+
+
+_services: Dict[str, InventoryService] = {}
+_services_lock = threading.Lock()
+
+
+def get_inventory(db_path: str) -> InventoryService:
+    """Общий сервис остатков для базы, создаётся при первом обращении."""
+    with _services_lock:
+        if db_path not in _services:
+            service = InventoryService(db_path)
+            atexit.register(service.close)
+            _services[db_path] = service
+        return _services[db_path]
+
+
+def reset_inventory(db_path: Optional[str] = None):
+    """Отбрасывает живые сервисы остатков (для базы db_path или все); следующий get_inventory создаст новый."""
+    with _services_lock:
+        for path in [p for p in _services if db_path is None or p == db_path]:
+            service = _services.pop(path)
+            atexit.unregister(service.close)
+            service.discard()
@@ -1,44 +1,11 @@
 import api_key
-from helper import _print_event
-from datetime import datetime
+import argparse
 import uuid
-import os
 import time
-from httpx import HTTPStatusError
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import ToolMessage
-from langchain_core.prompts import ChatPromptTemplate
-from tools import (
-    recommend_capsule_wardrobe,
-    recommend_style,
-    fetch_product_by_title,
-    fetch_product_by_category,
-    fetch_product_by_brand,
-    initialize_fetch,
-    fetch_all_categories,
-    fetch_recommendations,
-    add_to_cart,
-    remove_from_cart,
-    view_checkout_info,
-    get_delivery_estimate,
-    get_payment_options,
-    
-)
-from graph import ShoppingGraph
-from db_init import init_database
+from db_init import DB_PATH, catalog_version, init_database
+from startup import BackgroundInit, build_welcome_message, warm_database
 
-def main():
-    # Инициализация базы данных
-    init_database()
-    
-    # Инициализация модели Mistral
-    llm = init_chat_model("mistral-large-latest", model_provider="mistralai")
-
-    # Шаблон для ассистента
-    primary_assistant_prompt = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """Вы AI-стилист с четкими правилами работы. Основные задачи:
+SYSTEM_PROMPT = """Вы AI-стилист с четкими правилами работы. Основные задачи:
 
 1. При запросах со словами "гардероб", "комплект", "набор" ИСПОЛЬЗОВАТЬ ИНСТРУМЕНТ recommend_capsule_wardrobe
 2. Для деловых встреч использовать категорию "Business Clothing"
@@ -50,7 +17,39 @@ def main():
 {{"tool": "recommend_capsule_wardrobe", "args": {{"situation": "деловая встреча", "gender": "male", "max_price": 100}}}}
 
 Текущее время: {time}"""
-        ),
+
+def build_assistant():
+    # LangChain, LangGraph и провайдер модели импортируются здесь, а не при запуске,
+    # чтобы приветствие появлялось до их загрузки
+    from datetime import datetime
+    from langchain.chat_models import init_chat_model
+    from langchain_core.prompts import ChatPromptTemplate
+    from tools import (
+        recommend_capsule_wardrobe,
+        recommend_style,
+        fetch_product_by_title,
+        fetch_product_by_category,
+        fetch_product_by_brand,
+        initialize_fetch,
+        fetch_all_categories,
+        fetch_recommendations,
+        add_to_cart,
+        remove_from_cart,
+        view_checkout_info,
+        get_delivery_estimate,
+        get_payment_options,
+        
+    )
+    from graph import ShoppingGraph
+    from tool_selector import ToolSelector
+    from response_cache import ResponseCache
+
+    # Инициализация модели Mistral
+    llm = init_chat_model("mistral-large-latest", model_provider="mistralai")
+
+    # Шаблон для ассистента
+    primary_assistant_prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
         ("placeholder", "{messages}"),
     ]).partial(time=datetime.now())
 
@@ -69,14 +68,29 @@ def main():
         get_payment_options,
     ]
     tools_need_confirmation = [add_to_cart, remove_from_cart]
-    confirmation_tool_names = {t.name for t in tools_need_confirmation}
 
-    assistant_runnable = primary_assistant_prompt | llm.bind_tools(
-        tools_no_confirmation + tools_need_confirmation
+    # Для каждого хода привязываются только нужные инструменты, чтобы не отправлять все схемы
+    tool_selector = ToolSelector(
+        primary_assistant_prompt, llm, tools_no_confirmation + tools_need_confirmation
     )
+    # Повторяющиеся вопросы обслуживаются из кэша без обращения к модели
+    response_cache = ResponseCache(tool_selector, catalog_version=lambda: catalog_version(DB_PATH))
 
     # Создание ShoppingGraph
-    shopping_graph = ShoppingGraph(assistant_runnable, tools_no_confirmation, tools_need_confirmation)
+    shopping_graph = ShoppingGraph(response_cache, tools_no_confirmation, tools_need_confirmation)
+    return shopping_graph, tool_selector, response_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Shopping assistant")
+    parser.add_argument("--rebuild-db", action="store_true", help="пересобрать базу, даже если она актуальна")
+    parser.add_argument("--llm-welcome", action="store_true", help="получить приветствие от LLM вместо локальных данных")
+    args = parser.parse_args()
+
+    # Инициализация базы данных (пропускается, если база собрана из текущей версии каталога)
+    init_database(force=args.rebuild_db)
+
+    # Граф собирается в фоне, пока пользователь читает приветствие
+    assistant_init = BackgroundInit(build_assistant)
 
     # Уникальный ID сессии
     thread_id = str(uuid.uuid4())
@@ -87,33 +101,43 @@ def main():
         }
     }
 
-    print("Please wait for initialization")
-    
-    # Инициализация с обработкой rate limit
-    initial_query = "Please welcome me, and show me some available products and category."
     max_attempts = 5
-    attempt = 0
-    while attempt < max_attempts:
-        try:
-            initial_events = shopping_graph.stream_responses({"messages": ("user", initial_query)}, config)
-            break
-        except HTTPStatusError as err:
-            if err.response.status_code == 429:  # Rate limit
-                retry_after = int(err.response.headers.get("Retry-After", 10))
-                print(f"Rate limit exceeded during initialization. Waiting {retry_after} seconds before retrying...")
-                time.sleep(retry_after)
-            else:
-                print(f"An HTTP error occurred: {err}")
+    if args.llm_welcome:
+        print("Please wait for initialization")
+        shopping_graph, tool_selector, response_cache = assistant_init.result()
+        from httpx import HTTPStatusError
+
+        # Инициализация с обработкой rate limit
+        initial_query = "Please welcome me, and show me some available products and category."
+        initial_events = None
+        attempt = 0
+        while attempt < max_attempts:
+            try:
+                initial_events = shopping_graph.stream_responses({"messages": ("user", initial_query)}, config)
                 break
-            attempt += 1
+            except HTTPStatusError as err:
+                if err.response.status_code == 429:  # Rate limit
+                    retry_after = int(err.response.headers.get("Retry-After", 10))
+                    print(f"Rate limit exceeded during initialization. Waiting {retry_after} seconds before retrying...")
+                    time.sleep(retry_after)
+                else:
+                    print(f"An HTTP error occurred: {err}")
+                    break
+                attempt += 1
 
-    if initial_events is None:
-        print("Failed to fetch initial products after multiple attempts.")
-        return
+        if initial_events is None:
+            print("Failed to fetch initial products after multiple attempts.")
+            return
 
-    for event in initial_events:
-        final_result = event
-    final_result["messages"][-1].pretty_print()
+        for event in initial_events:
+            final_result = event
+        final_result["messages"][-1].pretty_print()
+    else:
+        # Приветствие из локальных данных, без запроса к LLM
+        print(build_welcome_message(DB_PATH))
+
+    # Файл базы дочитывается в кэш ОС в фоне, уже после приветствия
+    BackgroundInit(lambda: warm_database(DB_PATH))
 
     print("\nType your question below (or type 'exit' to end):\n")
 
@@ -124,13 +148,21 @@ def main():
             print("Ending session. Thank you for using the shopping assistant!")
             break
 
+        # К первому вопросу фоновая инициализация обычно уже завершена
+        shopping_graph, tool_selector, response_cache = assistant_init.result()
+        from httpx import HTTPStatusError
+        from langchain_core.messages import ToolMessage
+        from helper import _print_event
+
+        # Отчёт о привязанных инструментах собирается заново для каждого хода
+        tool_selector.reset_report()
         attempt = 0
         while attempt < max_attempts:
             try:
                 events = shopping_graph.stream_responses({"messages": ("user", question)}, config)
                 _printed = set()
                 for event in events:
-                    _print_event(event, _printed)
+                    _print_event(event, _printed, payload_store=shopping_graph.payload_store)
                 break
             except HTTPStatusError as err:
                 if err.response.status_code == 429:  # Rate limit
@@ -143,6 +175,13 @@ def main():
                     break
         if attempt == max_attempts:
             print("Failed to process your request after multiple attempts.")
+        report = tool_selector.last_report
+        if report:
+            print(
+                f"\n[tools: {len(report['tools'])}/{report['tools_total']}, model calls: {report['calls']},"
+                f" ~{report['tokens_saved']} schema tokens saved]"
+            )
+        print(f"[cache: hit rate {response_cache.hit_rate:.0%}, ~{response_cache.stats['latency_saved']:.1f}s saved]")
 
         # Обработка подтверждений
         snapshot = shopping_graph.get_state(config)
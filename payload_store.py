@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+PAYLOAD_DIR = "payload_store"
+
+# Результаты инструментов длиннее этого порога выносятся из состояния графа
+OFFLOAD_THRESHOLD = 1000
+
+SUMMARY_ITEMS = 3
+SUMMARY_CHARS = 200
+
+# Хранилище живёт между запусками: старые и лишние по объёму результаты удаляются
+PAYLOAD_MAX_AGE = 7 * 24 * 60 * 60
+PAYLOAD_MAX_BYTES = 64 * 1024 * 1024
+# Сколько последних результатов держать в памяти, чтобы не читать их с диска при каждом вызове модели
+PAYLOAD_CACHE_ENTRIES = 64
+
+
+def summarize(content: str) -> str:
+    """Короткое описание результата инструмента для состояния графа."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return content[:SUMMARY_CHARS]
+    if isinstance(data, dict):
+        if isinstance(data.get("recommendations"), list):
+            data = data["recommendations"]
+        else:
+            return f"{data.get('message', 'result')} (keys: {', '.join(map(str, data))})"[:SUMMARY_CHARS]
+    if isinstance(data, list):
+        names = [
+            str(item.get("title") or item.get("product_name") or item.get("message"))
+            for item in data[:SUMMARY_ITEMS]
+            if isinstance(item, dict)
+        ]
+        more = f" and {len(data) - len(names)} more" if len(data) > len(names) else ""
+        return f"{len(data)} items: {'; '.join(names)}{more}"[:SUMMARY_CHARS]
+    return content[:SUMMARY_CHARS]
+
+
+class PayloadStore:
+    """Хранилище больших результатов инструментов с адресацией по содержимому.
+
+    Одинаковые результаты сохраняются один раз; в сообщении остаются только
+    ссылка (sha256 содержимого) в additional_kwargs["payload_ref"] и краткое описание.
+    Перед вызовом модели содержимое восстанавливается по ссылке; последние
+    результаты кэшируются в памяти. Время изменения файла обновляется при
+    каждом обращении, и при открытии хранилища или превышении max_bytes
+    удаляются результаты старше max_age и самые давние сверх лимита объёма.
+    Сообщение, чей результат удалён, остаётся с кратким описанием.
+    """
+
+    def __init__(
+        self,
+        directory: str = PAYLOAD_DIR,
+        threshold: int = OFFLOAD_THRESHOLD,
+        max_age: float = PAYLOAD_MAX_AGE,
+        max_bytes: int = PAYLOAD_MAX_BYTES,
+        cache_entries: int = PAYLOAD_CACHE_ENTRIES,
+    ):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = self.prune()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key: str, content: str):
+        with self._lock:
+            self._cache[key] = content
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        """Удаляет результаты старше max_age и самые давние сверх max_bytes; возвращает оставшийся объём."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Временные файлы прерванной записи тоже удаляются по возрасту
+            if now - stat.st_mtime > self.max_age:
+                self._forget(name, path)
+            elif not name.endswith(".tmp"):
+                entries.append((stat.st_mtime, stat.st_size, name, path))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, name, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._forget(name, path)
+            total -= size
+        return total
+
+    def _forget(self, key: str, path: str):
+        with self._lock:
+            self._cache.pop(key, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def put(self, content: str) -> str:
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        path = self._path(key)
+        if os.path.exists(path):
+            self._touch(path)
+        else:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._total_bytes = self.prune()
+        self._remember(key, content)
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            content = self._cache.get(key)
+            if content is not None:
+                self._cache.move_to_end(key)
+                return content
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        self._remember(key, content)
+        return content
+
+    def offload(self, message):
+        """Заменяет содержимое большого ToolMessage ссылкой и кратким описанием."""
+        content = message.content
+        if not isinstance(content, str) or len(content) <= self.threshold or "payload_ref" in message.additional_kwargs:
+            return message
+        key = self.put(content)
+        return message.model_copy(update={
+            "content": f"[payload {key[:12]}, {len(content)} chars] {summarize(content)}",
+            "additional_kwargs": {**message.additional_kwargs, "payload_ref": key},
+        })
+
+    def rehydrate(self, message):
+        """Возвращает копию сообщения с полным содержимым, если оно было вынесено в хранилище."""
+        key = getattr(message, "additional_kwargs", {}).get("payload_ref")
+        if not key:
+            return message
+        content = self.get(key)
+        if content is None:
+            return message
+        additional_kwargs = {k: v for k, v in message.additional_kwargs.items() if k != "payload_ref"}
+        return message.model_copy(update={"content": content, "additional_kwargs": additional_kwargs})
+
+    def rehydrate_all(self, messages: List) -> List:
+        """Восстанавливает все вынесенные результаты инструментов для входа модели.
+
+        В чекпоинте остаются только ссылки, но модели нужны id и цены товаров
+        из прошлых ходов (например, чтобы добавить в корзину найденный ранее товар).
+        """
+        return [self.rehydrate(m) for m in messages]
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import time
+
+# Что импортируется до появления приветствия и что откладывается до первого вопроса
+PHASES = {
+    "fast start (до приветствия)": "import main",
+    "deferred (фоновая сборка графа)": "import langchain.chat_models, tools, graph, tool_selector, helper",
+}
+
+
+def import_profile(statement: str):
+    """Запускает statement в отдельном интерпретаторе с -X importtime и разбирает отчёт."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Модули верхнего уровня не имеют отступа в колонке имени
+        if not name[1:].startswith(" "):
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return completed.returncode, wall_ms, sorted(modules, reverse=True)
+
+
+def main(top: int = 10):
+    for phase, statement in PHASES.items():
+        returncode, wall_ms, modules = import_profile(statement)
+        total_ms = sum(ms for ms, _ in modules)
+        print(f"\n{phase}: {statement}")
+        if returncode != 0:
+            print("  импорт завершился с ошибкой (не установлены зависимости?)")
+        print(f"  импорт: {total_ms:.1f} ms, процесс целиком: {wall_ms:.1f} ms")
+        for ms, name in modules[:top]:
+            print(f"  {ms:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
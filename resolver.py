@@ -0,0 +1,177 @@
+import re
+import sqlite3
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+# Транслитерация кириллицы в латиницу (упрощённая, близкая к написанию брендов)
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+
+# Синонимы отдельных слов после транслитерации (русские названия категорий)
+SYNONYMS = {
+    "odezhda": "clothing",
+    "obuv": "footwear",
+    "aksessuary": "accessories",
+    "sumki": "bags",
+    "koshelki": "wallets",
+    "remni": "belts",
+    "igrushki": "toys",
+}
+
+# Юридические формы и прочие слова, не влияющие на сопоставление
+STOPWORDS = {"inc", "ltd", "llc", "co", "corp", "corporation", "pvt", "private", "limited", "company", "the", "and"}
+
+# Порог, начиная с которого нечеткое совпадение принимается без уточнения у пользователя
+AUTO_ACCEPT_SCORE = 0.85
+# ...и только если следующий вариант отстаёт хотя бы на столько ("shoes" одинаково похоже на "Men's Shoes" и "Women's Shoes")
+AUTO_ACCEPT_MARGIN = 0.05
+# Нечёткое сравнение выполняется только для значений с наибольшим числом общих триграмм
+MAX_FUZZY_CANDIDATES = 32
+
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_VOWELS = re.compile(r"[aeiouy ]+")
+
+
+def normalize(text: str) -> str:
+    """Приводит строку к виду для сравнения: регистр, Unicode, транслитерация, стоп-слова."""
+    # Транслитерация идёт до NFKD, иначе "й" и "ё" потеряют диакритику и превратятся в "и" и "е"
+    text = unicodedata.normalize("NFKD", (text or "").casefold().translate(_TRANSLIT_TABLE))
+    text = _NON_ALNUM.sub(" ", "".join(ch for ch in text if not unicodedata.combining(ch)))
+    tokens = [SYNONYMS.get(token, token) for token in text.split()]
+    return " ".join(token for token in tokens if token not in STOPWORDS) or " ".join(tokens)
+
+
+def skeleton(text: str) -> str:
+    """Согласные остова строки: транслитерации вроде "nayk" и "nike" дают одинаковый остов."""
+    return _VOWELS.sub("", text)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Расстояние Левенштейна."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class CatalogResolver:
+    """Сопоставляет произвольный ввод с каноническими значениями одной колонки каталога."""
+
+    def __init__(self, values: List[str]):
+        self.exact: Dict[str, List[str]] = defaultdict(list)
+        self.compact: Dict[str, List[str]] = defaultdict(list)
+        self.tokens: Dict[str, Set[str]] = {}
+        self.trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        self.skeletons: Dict[str, Set[str]] = defaultdict(set)
+
+        for value in values:
+            if not value:
+                continue
+            key = normalize(value)
+            if key not in self.tokens:
+                self.tokens[key] = set(key.split())
+                for gram in trigrams(key):
+                    self.trigram_index[gram].add(key)
+                if len(key) > 2:
+                    self.skeletons[skeleton(key)].add(key)
+            self.exact[key].append(value)
+            self.compact[key.replace(" ", "")].append(value)
+
+    @classmethod
+    def from_db(cls, db_path: str, table: str, column: str) -> "CatalogResolver":
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(f"SELECT DISTINCT {column} FROM {table}").fetchall()
+        finally:
+            conn.close()
+        return cls([row[0] for row in rows])
+
+    def _score(self, query: str, query_grams: Set[str], key: str) -> float:
+        grams = trigrams(key)
+        trigram_score = len(query_grams & grams) / len(query_grams | grams)
+        edit_score = 1 - edit_distance(query, key) / max(len(query), len(key))
+        # "одежда" -> "clothing" должно находить "Clothing and Accessories"
+        containment_score = 0.9 if set(query.split()) <= self.tokens[key] else 0.0
+        skeleton_score = 0.8 if len(key) > 2 and skeleton(query) == skeleton(key) else 0.0
+        return max(trigram_score, edit_score, containment_score, skeleton_score)
+
+    def _ranked(self, query: str) -> List[Tuple[float, str]]:
+        """Нормализованные ключи каталога, похожие на запрос, по убыванию оценки."""
+        query_grams = trigrams(query)
+        overlap = Counter()
+        for gram in query_grams:
+            overlap.update(self.trigram_index.get(gram, ()))
+        # Совпадение одной триграммы (часто это просто "  n") не делает значение кандидатом,
+        # если у ввода достаточно триграмм; редкие опечатки добирает индекс остовов
+        min_overlap = 2 if len(query_grams) >= 4 else 1
+        candidates = {key for key, count in overlap.most_common(MAX_FUZZY_CANDIDATES) if count >= min_overlap}
+        candidates |= self.skeletons.get(skeleton(query), set())
+        return sorted(
+            ((self._score(query, query_grams, key), key) for key in candidates),
+            key=lambda item: (-item[0], item[1]),
+        )
+
+    def suggest(self, text: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Ранжированные канонические значения, похожие на ввод, с оценкой от 0 до 1."""
+        query = normalize(text)
+        if not query:
+            return []
+        return self._suggestions(self._ranked(query), limit)
+
+    def _suggestions(self, ranked: List[Tuple[float, str]], limit: int) -> List[Tuple[str, float]]:
+        return [(value, round(score, 3)) for score, key in ranked[:limit] for value in self.exact[key]]
+
+    def resolve(self, text: str) -> Dict:
+        """Канонические значения для ввода и подсказки, если точного совпадения нет.
+
+        matches пуст, если ни точное, ни достаточно уверенное нечёткое
+        совпадение не найдено; тогда suggestions содержит ближайшие варианты.
+        Если несколько значений почти одинаково уверенно подходят, ambiguous
+        равно True и выбор остаётся за пользователем.
+        """
+        query = normalize(text)
+        matches = self.exact.get(query) or self.compact.get(query.replace(" ", ""))
+        if matches:
+            return {"matches": list(matches), "suggestions": [], "ambiguous": False}
+        if not query:
+            return {"matches": [], "suggestions": [], "ambiguous": False}
+        ranked = self._ranked(query)
+        suggestions = self._suggestions(ranked, 5)
+        if ranked and ranked[0][0] >= AUTO_ACCEPT_SCORE:
+            if len(ranked) == 1 or ranked[0][0] - ranked[1][0] >= AUTO_ACCEPT_MARGIN:
+                return {"matches": list(self.exact[ranked[0][1]]), "suggestions": suggestions, "ambiguous": False}
+            return {"matches": [], "suggestions": suggestions, "ambiguous": True}
+        return {"matches": [], "suggestions": suggestions, "ambiguous": False}
+
+
+_resolvers: Dict[Tuple[str, str, str], CatalogResolver] = {}
+
+
+def get_resolver(db_path: str, table: str, column: str) -> CatalogResolver:
+    """Резолвер колонки, загружаемый из базы один раз за время жизни процесса."""
+    key = (db_path, table, column)
+    if key not in _resolvers:
+        _resolvers[key] = CatalogResolver.from_db(db_path, table, column)
+    return _resolvers[key]
+
+
+def invalidate_resolvers():
+    """Сбрасывает загруженные резолверы; вызывается после пересборки каталога."""
+    _resolvers.clear()
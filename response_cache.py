@@ -0,0 +1,145 @@
+import hashlib
+import json
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Инструменты, меняющие корзину: ходы с ними никогда не берутся из кэша и не кэшируются
+MUTATING_TOOLS = {"add_to_cart", "remove_from_cart"}
+# Запросы о корзине тоже обходят кэш, даже если модель ещё не вызвала инструмент
+CART_KEYWORDS = ["корзин", "добав", "удал", "убер", "cart", "add", "remove", "delete"]
+
+CACHE_TTL = 15 * 60
+CACHE_MAX_ENTRIES = 512
+# Слова вежливости и служебные слова не влияют на ответ: "please show me nike" и "show nike" совпадают
+FILLER_WORDS = {
+    "please", "pls", "kindly", "can", "could", "would", "you", "me", "i", "a", "an", "the", "just",
+    "hi", "hello", "thanks", "пожалуйста", "можно", "мне", "ну", "а", "просто", "привет", "спасибо",
+}
+
+_WORDS = re.compile(r"\w+")
+
+
+def _current_turn(messages: Sequence):
+    last_human = max((i for i, m in enumerate(messages) if getattr(m, "type", None) == "human"), default=-1)
+    return (messages[last_human] if last_human >= 0 else None), messages[last_human + 1:]
+
+
+def _text(message) -> str:
+    content = getattr(message, "content", "") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _cache_text(text: str) -> str:
+    """Множество слов запроса без служебных; порядок слов и повторы не важны."""
+    words = _WORDS.findall(text.casefold())
+    return " ".join(sorted(set(words) - FILLER_WORDS or set(words)))
+
+
+def _fresh_copy(message):
+    """Копия ответа из кэша с новыми id, иначе add_messages заменит прежнее сообщение вместо добавления."""
+    tool_calls = [{**call, "id": f"call_{uuid.uuid4().hex[:24]}"} for call in getattr(message, "tool_calls", [])]
+    return message.model_copy(update={"id": str(uuid.uuid4()), "tool_calls": tool_calls})
+
+
+class ResponseCache:
+    """Кэш ответов ассистента перед вызовом модели.
+
+    Ключ — множество слов запроса без служебных (FILLER_WORDS) и отпечаток:
+    версия каталога, вся предыдущая переписка и результаты инструментов
+    текущего хода. Поэтому уточняющие вопросы ("а какой дешевле?") берутся
+    из кэша только в той же истории диалога. Записи живут ttl секунд,
+    при переполнении вытесняется давно не использованная.
+    """
+
+    def __init__(
+        self,
+        runnable,
+        catalog_version: Callable[[], Optional[str]] = lambda: None,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.runnable = runnable
+        self.catalog_version = catalog_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (отпечаток, слова запроса) -> (ответ, время записи, задержка модели)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "latency_saved": 0.0}
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _fingerprint(self, history: Sequence, turn_messages: Sequence) -> str:
+        digest = hashlib.sha256(str(self.catalog_version()).encode("utf-8"))
+        # id сообщений и вызовов не учитываются: ответ из кэша получает новые id, но ту же историю;
+        # прошлые вопросы сравниваются так же, как текущий
+        for message in history:
+            message_type, text = getattr(message, "type", None), _text(message)
+            calls = [(call["name"], call["args"]) for call in getattr(message, "tool_calls", None) or []]
+            digest.update(b"\0" + json.dumps(
+                [message_type, getattr(message, "name", None), _cache_text(text) if message_type == "human" else text, calls],
+                ensure_ascii=False, sort_keys=True, default=str,
+            ).encode("utf-8"))
+        digest.update(b"\1")
+        for message in turn_messages:
+            if getattr(message, "type", None) == "tool":
+                digest.update(b"\0" + (getattr(message, "name", None) or "").encode("utf-8") + b"\0" + _text(message).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _should_bypass(self, raw_text: str, turn_messages: Sequence) -> bool:
+        if any(keyword in raw_text.lower() for keyword in CART_KEYWORDS):
+            return True
+        return any(
+            call["name"] in MUTATING_TOOLS
+            for message in turn_messages
+            for call in getattr(message, "tool_calls", None) or []
+        )
+
+    def _lookup(self, fingerprint: str, text: str):
+        now = time.time()
+        for key in [k for k, entry in self._entries.items() if now - entry[1] > self.ttl]:
+            del self._entries[key]
+
+        key = (fingerprint, text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        return None
+
+    def invoke(self, state: Dict, config=None):
+        messages = state["messages"]
+        human, turn_messages = _current_turn(messages)
+        raw_text = _text(human) if human is not None else ""
+        text = _cache_text(raw_text)
+        if not text or self._should_bypass(raw_text, turn_messages):
+            self.stats["bypassed"] += 1
+            return self.runnable.invoke(state, config)
+
+        history = messages[:len(messages) - len(turn_messages) - 1]
+        fingerprint = self._fingerprint(history, turn_messages)
+        entry = self._lookup(fingerprint, text)
+        if entry is not None:
+            self.stats["hits"] += 1
+            self.stats["latency_saved"] += entry[2]
+            return _fresh_copy(entry[0])
+
+        self.stats["misses"] += 1
+        start = time.perf_counter()
+        result = self.runnable.invoke(state, config)
+        latency = time.perf_counter() - start
+
+        # Пустые ответы и вызовы инструментов корзины не кэшируются
+        calls_mutating = any(call["name"] in MUTATING_TOOLS for call in getattr(result, "tool_calls", None) or [])
+        if (result.content or getattr(result, "tool_calls", None)) and not calls_mutating:
+            self._entries[(fingerprint, text)] = (result, time.time(), latency)
+            self._entries.move_to_end((fingerprint, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+from typing import Callable
+
+WARM_CHUNK_SIZE = 1 << 20
+
+
+def warm_database(db_path: str) -> int:
+    """Последовательно читает файл базы, чтобы он попал в страничный кэш ОС.
+
+    Кэш страниц SQLite принадлежит соединению, а инструменты открывают свои,
+    поэтому прогревается только кэш ОС: первые запросы не ждут случайного
+    чтения с диска. Запускается в фоне после приветствия. Возвращает число
+    прочитанных байт; отсутствующая база просто пропускается.
+    """
+    total = 0
+    try:
+        with open(db_path, "rb") as f:
+            while chunk := f.read(WARM_CHUNK_SIZE):
+                total += len(chunk)
+    except OSError:
+        pass
+    return total
+
+
+def build_welcome_message(db_path: str, featured_count: int = 5) -> str:
+    """Приветствие из локальных данных: категории и популярные товары в наличии, без вызова LLM."""
+    conn = sqlite3.connect(db_path)
+    try:
+        categories = [row[0] for row in conn.execute(
+            "SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' ORDER BY category"
+        )]
+        featured = conn.execute("""
+            SELECT title, price, rating
+            FROM products
+            WHERE stock > 0
+            ORDER BY rating DESC, price ASC
+            LIMIT ?
+        """, (featured_count,)).fetchall()
+    except sqlite3.OperationalError:
+        categories, featured = [], []
+    finally:
+        conn.close()
+
+    lines = ["Welcome to the shopping assistant!"]
+    if categories:
+        lines.append("\nAvailable categories: " + ", ".join(categories) + ".")
+    if featured:
+        lines.append("\nFeatured products:")
+        lines.extend(f"{i}. {title} - {price} (rating {rating})" for i, (title, price, rating) in enumerate(featured, 1))
+    return "\n".join(lines)
+
+
+class BackgroundInit:
+    """Выполняет тяжёлую инициализацию (импорты, сборку графа) в фоне, пока пользователь читает приветствие."""
+
+    def __init__(self, target: Callable):
+        self._target = target
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._target()
+        except BaseException as e:
+            self._error = e
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
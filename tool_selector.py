@@ -0,0 +1,121 @@
+import json
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Группы инструментов и ключевые слова (основы слов), по которым группа нужна в текущем ходе.
+# Группа с "always" привязывается в каждом ходе: поиск товара нужен и для добавления в корзину
+TOOL_GROUPS = {
+    "catalog": {
+        "always": True,
+        "tools": [
+            "fetch_product_by_title",
+            "fetch_product_by_category",
+            "fetch_product_by_brand",
+            "initialize_fetch",
+            "fetch_all_categories",
+            "fetch_recommendations",
+        ],
+        "keywords": [
+            "товар", "продукт", "покаж", "найд", "найт", "ищ", "поиск", "категор", "бренд", "марк",
+            "похож", "доступн", "каталог", "product", "item", "show", "find", "search", "categor",
+            "brand", "similar", "available", "catalog", "welcome", "привет",
+        ],
+    },
+    "style": {
+        "tools": ["recommend_capsule_wardrobe", "recommend_style"],
+        "keywords": [
+            "гардероб", "комплект", "набор", "образ", "стил", "встреч", "вечерин", "спорт",
+            "повседнев", "надеть", "wardrobe", "outfit", "style", "look", "wear", "meeting", "party",
+        ],
+    },
+    "cart": {
+        "tools": ["add_to_cart", "remove_from_cart", "view_checkout_info"],
+        "keywords": [
+            "корзин", "добав", "удал", "убер", "куп", "заказ", "оформ", "итог", "cart", "add",
+            "remove", "delete", "buy", "order", "checkout", "total",
+        ],
+    },
+    "checkout": {
+        "tools": ["get_delivery_estimate", "get_payment_options", "view_checkout_info"],
+        "keywords": [
+            "доставк", "привез", "когда", "оплат", "плат", "карт", "delivery", "ship", "arrive",
+            "pay", "card", "paypal",
+        ],
+    },
+}
+
+
+def estimate_tokens(tool) -> int:
+    """Грубая оценка числа токенов JSON-схемы инструмента (около 4 символов на токен)."""
+    schema = convert_to_openai_tool(tool)
+    return len(json.dumps(schema, ensure_ascii=False)) // 4 + 1
+
+
+def _last_user_text(messages: Sequence) -> str:
+    for message in reversed(messages):
+        if getattr(message, "type", None) == "human":
+            content = message.content
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content.lower()
+    return ""
+
+
+class ToolSelector:
+    """Привязывает к модели только инструменты, нужные для текущего хода.
+
+    Подмножество выбирается по ключевым словам последнего сообщения
+    пользователя, поэтому внутри одного хода (включая повторные вызовы
+    ассистента после ответов инструментов) оно не меняется. Группы с
+    "always" (поиск по каталогу) добавляются всегда. Если ни одна группа
+    не подошла по ключевым словам, привязываются все инструменты. Связки
+    prompt | llm.bind_tools(...) кэшируются по набору имён инструментов.
+    last_report суммирует экономию по всем вызовам модели с последнего
+    reset_report(); None, если модель не вызывалась (например, ответ из кэша).
+    """
+
+    def __init__(self, prompt, llm, tools: List, groups: Dict = TOOL_GROUPS):
+        self.prompt = prompt
+        self.llm = llm
+        self.tools = list(tools)
+        self.groups = groups
+        self.schema_tokens = {tool.name: estimate_tokens(tool) for tool in self.tools}
+        self._runnables: Dict[Tuple[str, ...], object] = {}
+        self.last_report = None
+
+    def select(self, messages: Sequence) -> Tuple[str, ...]:
+        text = _last_user_text(messages)
+        names, matched = set(), False
+        for group in self.groups.values():
+            if any(keyword in text for keyword in group["keywords"]):
+                names.update(group["tools"])
+                matched = True
+            elif group.get("always"):
+                names.update(group["tools"])
+        if not matched:
+            return tuple(tool.name for tool in self.tools)
+        # Сохраняем исходный порядок инструментов, чтобы ключ кэша был стабильным
+        return tuple(tool.name for tool in self.tools if tool.name in names)
+
+    def runnable_for(self, names: Tuple[str, ...]):
+        if names not in self._runnables:
+            subset = [tool for tool in self.tools if tool.name in names]
+            self._runnables[names] = self.prompt | self.llm.bind_tools(subset)
+        return self._runnables[names]
+
+    def reset_report(self):
+        """Начинает новый отчёт; вызывается в начале каждого хода пользователя."""
+        self.last_report = None
+
+    def invoke(self, state: Dict, config=None):
+        names = self.select(state["messages"])
+        full_tokens = sum(self.schema_tokens.values())
+        selected_tokens = sum(self.schema_tokens[name] for name in names)
+        report = self.last_report or {"tools": [], "tools_total": len(self.tools), "calls": 0, "schema_tokens": 0, "tokens_saved": 0}
+        report["tools"] = sorted(set(report["tools"]) | set(names), key=[tool.name for tool in self.tools].index)
+        report["calls"] += 1
+        report["schema_tokens"] += selected_tokens
+        report["tokens_saved"] += full_tokens - selected_tokens
+        self.last_report = report
+        return self.runnable_for(names).invoke(state, config)
@@ -3,6 +3,11 @@ from typing import List, Dict, Optional
 from langchain_core.tools import tool
 from langchain_core.runnables import RunnableConfig
 from datetime import datetime, timedelta
+import numpy as np
+from catalog_snapshot import fetch_rows, get_snapshot
+from inventory import get_inventory
+from resolver import get_resolver
+from wardrobe import SLOT_KEYWORDS, group_candidates, optimize_outfit, resolve_situation, solve_outfit
 
 db = "shopping_assistant.sqlite"
 
@@ -17,21 +22,32 @@ def recommend_cosmetics(skin_type: str, gender: str, max_price: float, category:
     """Рекомендует косметические товары с учетом типа кожи, пола, бюджета и категории."""
     conn = sqlite3.connect(db)
     cursor = conn.cursor()
+    columns = ["product_name", "brand", "price_usd", "category", "skin_type"]
     
-    query = """
-    SELECT product_name, brand, price_usd, category, skin_type
-    FROM cosmetics 
-    WHERE skin_type = ? AND gender_target = ? AND price_usd <= ?
-    """
-    params = [skin_type, gender, max_price]
-    
-    if category:
-        query += " AND category = ?"
-        params.append(category)
-    
-    query += " ORDER BY price_usd ASC LIMIT 3"
-    cursor.execute(query, params)
-    items = cursor.fetchall()
+    snapshot = get_snapshot(cursor)
+    table = snapshot.table("cosmetics") if snapshot else None
+    if table is not None:
+        # Фильтрация и top-k по колоночному снимку, из SQLite дочитываются только найденные строки
+        equals = {"skin_type": skin_type, "gender": gender}
+        if category:
+            equals["category"] = category
+        rowids = table.top_k(table.mask(equals, {"price": (None, max_price)}), "price", 3)
+        items = [tuple(row.values()) for row in fetch_rows(cursor, "cosmetics", columns, rowids)]
+    else:
+        query = """
+        SELECT product_name, brand, price_usd, category, skin_type
+        FROM cosmetics 
+        WHERE skin_type = ? AND gender_target = ? AND price_usd <= ?
+        """
+        params = [skin_type, gender, max_price]
+        
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+        
+        query += " ORDER BY price_usd ASC LIMIT 3"
+        cursor.execute(query, params)
+        items = cursor.fetchall()
     
     conn.close()
     
@@ -46,52 +62,86 @@ def recommend_cosmetics(skin_type: str, gender: str, max_price: float, category:
     }
 
 
-# В файле tools.py модифицируйте инструмент:
 @tool
 def recommend_capsule_wardrobe(situation: str, gender: str, max_price: float) -> Dict:
-    """Рекомендует капсульный гардероб с учетом пола, ситуации и бюджета."""
+    """Подбирает комплект (верх, низ, обувь, аксессуар) с максимальным рейтингом в пределах бюджета."""
     try:
         conn = sqlite3.connect(db)
         cursor = conn.cursor()
-        
-        # Фильтрация для деловой встречи
-        if situation.lower() == "деловая встреча":
+
+        tag = resolve_situation(situation)
+        snapshot = get_snapshot(cursor)
+        table = snapshot.table("products") if snapshot else None
+
+        if table is not None:
+            # Векторизованный отбор кандидатов по колоночному снимку
+            equals = {"slot": list(SLOT_KEYWORDS)}
+            if gender.lower() in ("male", "female"):
+                equals["gender"] = [gender.lower(), ""]
+            mask = table.mask(equals, {"price": (None, max_price), "stock": (1, None)})
+            if tag:
+                cursor.execute("SELECT product_id FROM product_situations WHERE tag = ?", (tag,))
+                mask &= np.isin(table.rowid, [row[0] for row in cursor.fetchall()])
+
+            # Остатки в снимке обновляются только при сборке каталога, поэтому выбранные товары
+            # сверяются с текущими остатками; распроданные исключаются и комплект подбирается заново
+            inventory = get_inventory(db)
+            while True:
+                slot_rows = {}
+                slot_arrays = {}
+                for slot in SLOT_KEYWORDS:
+                    rows_idx = np.flatnonzero(mask & (table.codes["slot"] == table.vocabularies["slot"].get(slot, -1)))
+                    slot_rows[slot] = rows_idx
+                    slot_arrays[slot] = (table.numeric["price"][rows_idx], table.numeric["rating"][rows_idx])
+
+                result = solve_outfit(slot_arrays, max_price)
+                missing_slots = [slot for slot, rows_idx in slot_rows.items() if not rows_idx.size]
+                if not result:
+                    break
+                chosen = {slot: int(table.rowid[slot_rows[slot][index]]) for slot, index in result.pop("choices").items()}
+                sold_out = [rowid for rowid in chosen.values() if (inventory.available(rowid) or 0) <= 0]
+                if not sold_out:
+                    items = fetch_rows(cursor, "products", ["id", "title", "price", "rating", "brand", "category"], chosen.values())
+                    result["outfit"] = dict(zip(chosen, items))
+                    break
+                mask &= ~np.isin(table.rowid, sold_out)
+        else:
+            # Предварительный отбор кандидатов: в наличии, не дороже бюджета, подходят под ситуацию
             query = """
-            SELECT title, price, description 
-            FROM products 
-            WHERE 
-                (category = 'Business Clothing' OR 
-                description LIKE '%formal%' OR 
-                description LIKE '%business%' OR 
-                description LIKE '%office%') AND
-                price <= ?
-            ORDER BY price ASC
-            LIMIT 3
+            SELECT id, title, price, rating, brand, category
+            FROM products
+            WHERE stock > 0 AND price <= ?
             """
-            cursor.execute(query, (gender, max_price))
-        else:
-            return {"error": "Пока что поддерживаются только деловые встречи."}
-        
-        # Обработка результатов
-        items = cursor.fetchall()
-        if not items:
+            params = [max_price]
+            if tag:
+                query += " AND id IN (SELECT product_id FROM product_situations WHERE tag = ?)"
+                params.append(tag)
+
+            cursor.execute(query, params)
+            column_names = [desc[0] for desc in cursor.description]
+            rows = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+
+            candidates = group_candidates(rows, gender)
+            result = optimize_outfit(candidates, max_price)
+            missing_slots = [slot for slot, items in candidates.items() if not items]
+
+        if not result:
             return {"error": "Нет подходящих товаров для данной ситуации и бюджета."}
-            
+
         return {
             "recommendations": [
-                {
-                    "title": item[0],
-                    "price": item[1],
-                    "description": item[2]
-                } for item in items
+                {"slot": slot, **item} for slot, item in result["outfit"].items()
             ],
-            "total": sum(item[1] for item in items)
+            "total": result["total_price"],
+            "total_rating": result["total_rating"],
+            "missing_slots": missing_slots,
         }
-        
+
     except Exception as e:
         return {"error": str(e)}
     finally:
         conn.close()
+
 @tool
 def recommend_style(situation: str) -> Dict:
     """Рекомендует капсульный гардероб для заданной ситуации с детальными объяснениями сочетания товаров."""
@@ -99,37 +149,38 @@ def recommend_style(situation: str) -> Dict:
         conn = sqlite3.connect(db)
         cursor = conn.cursor()
         
-        categories = ["Clothing", "Footwear", "Accessories"]
+        tag = resolve_situation(situation)
         recommendations = []
-        
-        for category in categories:
-            query = """
-            SELECT id, title, description, price, brand, category, situations 
-            FROM products 
-            WHERE situations LIKE ? AND category = ?
-            LIMIT 1
-            """
-            cursor.execute(query, (f"%{situation}%", category))
-            row = cursor.fetchone()
-            if row:
-                column_names = [desc[0] for desc in cursor.description]
-                product = dict(zip(column_names, row))
-                tags = product['situations'].split(', ')
-                explanation = f"{product['title']} идеален для '{situation}', так как он помечен тегами: {', '.join(tags)}, а описание '{product['description']}' подчёркивает его уместность."
-                product['explanation'] = explanation
-                recommendations.append(product)
+
+        # Лучший товар в каждой категории за один проход по индексу тегов
+        query = """
+        WITH ranked AS (
+            SELECT p.id, p.title, p.description, p.price, p.brand, p.category,
+                   ROW_NUMBER() OVER (PARTITION BY ps.category ORDER BY p.rating DESC, p.price ASC) AS rn
+            FROM product_situations ps
+            JOIN products p ON p.id = ps.product_id
+            WHERE ps.tag = ?
+        )
+        SELECT id, title, description, price, brand, category,
+               (SELECT group_concat(tag, ', ') FROM product_situations WHERE product_id = ranked.id) AS situations
+        FROM ranked
+        WHERE rn = 1
+        ORDER BY category
+        """
+        cursor.execute(query, (tag,))
+        column_names = [desc[0] for desc in cursor.description]
+        for row in cursor.fetchall():
+            product = dict(zip(column_names, row))
+            tags = product['situations'].split(', ')
+            explanation = f"{product['title']} идеален для '{situation}', так как он помечен тегами: {', '.join(tags)}, а описание '{product['description']}' подчёркивает его уместность."
+            product['explanation'] = explanation
+            recommendations.append(product)
         
         if not recommendations:
             return {"message": f"Не найдено подходящих вещей для ситуации '{situation}'."}
         
-        if len(recommendations) == 3:
-            combination_explanation = f"Эти товары идеально подходят для '{situation}': "
-            combination_explanation += f"{recommendations[0]['title']} (одежда) задаёт основу образа благодаря '{recommendations[0]['description']}', "
-            combination_explanation += f"{recommendations[1]['title']} (обувь) гармонично дополняет его за счёт '{recommendations[1]['description']}', "
-            combination_explanation += f"а {recommendations[2]['title']} (аксессуар) добавляет завершающий штрих благодаря '{recommendations[2]['description']}'."
-        else:
-            combination_explanation = f"Эти товары рекомендованы для '{situation}': "
-            combination_explanation += " и ".join([f"{product['title']} ({product['category']}) с характеристикой '{product['description']}'" for product in recommendations]) + " вместе создают стильный образ."
+        combination_explanation = f"Эти товары рекомендованы для '{situation}': "
+        combination_explanation += " и ".join([f"{product['title']} ({product['category']}) с характеристикой '{product['description']}'" for product in recommendations]) + " вместе создают стильный образ."
         
     except Exception as e:
         return {"message": f"Произошла ошибка: {str(e)}"}
@@ -180,13 +231,19 @@ def fetch_product_by_category(category: str) -> List[Dict]:
         conn = sqlite3.connect(db)
         cursor = conn.cursor()
 
-        query = """
+        # Приводим произвольный ввод ("footwear", "обувь") к значениям из каталога
+        resolution = get_resolver(db, "products", "category").resolve(category)
+        if not resolution["matches"]:
+            message = "Several categories match, please specify one." if resolution["ambiguous"] else "No products found in the specified category."
+            return [{"message": message, "suggestions": [value for value, _ in resolution["suggestions"]]}]
+
+        query = f"""
         SELECT id, title, description, price, discountPercentage, rating, brand, category, thumbnail 
         FROM products
-        WHERE category = ? LIMIT 10
+        WHERE category IN ({', '.join('?' * len(resolution["matches"]))}) LIMIT 10
         """
         
-        cursor.execute(query, (category,))
+        cursor.execute(query, resolution["matches"])
         rows = cursor.fetchall()
 
         if not rows:
@@ -210,13 +267,20 @@ def fetch_product_by_brand(brand: str) -> List[Dict]:
         conn = sqlite3.connect(db)
         cursor = conn.cursor()
 
-        query = """
+        # Приводим произвольный ввод ("nike", "Nike Inc", "адидас") к значениям из каталога;
+        # для неуверенных ("найк") и неоднозначных ("allen") совпадений возвращаются подсказки
+        resolution = get_resolver(db, "products", "brand").resolve(brand)
+        if not resolution["matches"]:
+            message = "Several brands match, please specify one." if resolution["ambiguous"] else "No products found for the specified brand."
+            return [{"message": message, "suggestions": [value for value, _ in resolution["suggestions"]]}]
+
+        query = f"""
         SELECT id, title, description, price, discountPercentage, rating, brand, category, thumbnail 
         FROM products
-        WHERE brand = ? LIMIT 10
+        WHERE brand IN ({', '.join('?' * len(resolution["matches"]))}) LIMIT 10
         """
         
-        cursor.execute(query, (brand,))
+        cursor.execute(query, resolution["matches"])
         rows = cursor.fetchall()
 
         if not rows:
@@ -322,44 +386,18 @@ def add_to_cart(config: RunnableConfig, product_id: int, quantity: int = 1) -> D
         if not user_id:
             raise ValueError("Не указан user_id.")
         
-        conn = sqlite3.connect(db)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id, stock FROM products WHERE id = ?", (product_id,))
-        product_result = cursor.fetchone()
-        if not product_result:
+        # Остаток и строка корзины меняются в памяти сервиса, в SQLite они попадут пакетной записью
+        inventory = get_inventory(db)
+        action = "обновлен" if product_id in inventory.cart(user_id) else "добавлен"
+        reserved, stock = inventory.reserve(user_id, product_id, quantity)
+        if stock is None:
             return {"message": "Товар не найден."}
-        
-        stock = product_result[1]
-        if stock < quantity:
+        if not reserved:
             return {"message": f"Недостаточно товара на складе. Доступно только {stock} единиц."}
-
-        cursor.execute("SELECT quantity FROM cart WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-        result = cursor.fetchone()
-
-        if result:
-            new_quantity = result[0] + quantity
-            if stock < new_quantity:
-                return {"message": f"Недостаточно товара на складе. Доступно только {stock} единиц."}
-            cursor.execute("UPDATE cart SET quantity = ? WHERE user_id = ? AND product_id = ?", (new_quantity, user_id, product_id))
-            action = "обновлен"
-        else:
-            cursor.execute("INSERT INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)", (user_id, product_id, quantity))
-            action = "добавлен"
-
-        new_stock = stock - quantity
-        cursor.execute("UPDATE products SET stock = ? WHERE id = ?", (new_stock, product_id))
-
-        conn.commit()
-
-        cursor.execute("SELECT product_id, quantity FROM cart WHERE user_id = ?", (user_id,))
-        cart_items = cursor.fetchall()
+        cart_items = inventory.cart(user_id).items()
 
     except Exception as e:
         return {"message": f"Произошла ошибка: {str(e)}"}
-    finally:
-        cursor.close()
-        conn.close()
 
     return {
         "message": f"Товар {action} в вашей корзине.",
@@ -375,26 +413,12 @@ def remove_from_cart(config: RunnableConfig, product_id: int) -> Dict:
         if not user_id:
             raise ValueError("No user_id configured.")
         
-        conn = sqlite3.connect(db)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT quantity FROM cart WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-        result = cursor.fetchone()
-
-        if not result:
+        # Строка корзины удаляется из базы вместе с резервом при пакетной записи
+        if not get_inventory(db).release(user_id, product_id):
             return {"message": "Item not found in your cart."}
 
-        cursor.execute("DELETE FROM cart WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-        conn.commit()
-
-        cursor.execute("SELECT product_id, quantity FROM cart WHERE user_id = ?", (user_id,))
-        cart_items = cursor.fetchall()
-
     except Exception as e:
         return {"message": f"An error occurred: {str(e)}"}
-    finally:
-        cursor.close()
-        conn.close()
 
     return {
         "message": "Item has been removed from your cart."
@@ -412,13 +436,14 @@ def view_checkout_info(config: RunnableConfig) -> Dict:
         conn = sqlite3.connect(db)
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT p.id as product_id, p.title, p.price, c.quantity 
-            FROM cart c 
-            JOIN products p ON c.product_id = p.id
-            WHERE c.user_id = ?
-        """, (user_id,))
-        cart_items = cursor.fetchall()
+        # Количества берутся из сервиса остатков: в таблице cart может не быть последних изменений
+        cart = get_inventory(db).cart(user_id)
+        cursor.execute(f"""
+            SELECT id as product_id, title, price
+            FROM products
+            WHERE id IN ({', '.join('?' * len(cart))})
+        """, list(cart))
+        cart_items = [row + (cart[row[0]],) for row in cursor.fetchall()]
 
         total_price = sum(item[2] * item[3] for item in cart_items)
         items = [{"product_id": item[0], "title": item[1], "price": item[2], "quantity": item[3]} for item in cart_items]
@@ -0,0 +1,161 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Слоты образа и ключевые слова в названии товара, по которым товар попадает в слот
+SLOT_KEYWORDS = {
+    "top": ["shirt", "t-shirt", "tshirt", "top", "kurta", "blazer", "jacket", "sweater", "sweatshirt", "polo", "hoodie"],
+    "bottom": ["trouser", "jeans", "pant", "chino", "shorts", "skirt", "track"],
+    "footwear": ["shoe", "sneaker", "sandal", "boot", "loafer", "slipper", "heel", "flip flop"],
+    "accessory": ["watch", "belt", "bag", "wallet", "cap", "tie", "sunglass", "scarf", "backpack"],
+}
+
+# Теги ситуаций и ключевые слова в названии/описании, по которым товар получает тег
+SITUATION_KEYWORDS = {
+    "деловая встреча": ["formal", "business", "office"],
+    "вечеринка": ["party", "evening", "club"],
+    "спорт": ["sport", "running", "gym", "training"],
+    "повседневный": ["casual", "daily", "everyday"],
+}
+
+_SLOT_PATTERNS = {
+    slot: re.compile(r"\b(" + "|".join(re.escape(k) for k in keywords) + r")s?\b", re.IGNORECASE)
+    for slot, keywords in SLOT_KEYWORDS.items()
+}
+_GENDER_PATTERNS = {
+    "male": re.compile(r"\b(men|man|mens|men's|boys?)\b", re.IGNORECASE),
+    "female": re.compile(r"\b(women|woman|womens|women's|girls?|ladies)\b", re.IGNORECASE),
+}
+
+
+def classify_slot(title: str) -> Optional[str]:
+    """Определяет слот образа по названию товара (первое совпадение в порядке SLOT_KEYWORDS)."""
+    for slot, pattern in _SLOT_PATTERNS.items():
+        if pattern.search(title or ""):
+            return slot
+    return None
+
+
+def matches_gender(title: str, gender: str) -> bool:
+    """Товар подходит, если в названии указан нужный пол или пол не указан вовсе."""
+    gender = (gender or "").lower()
+    if gender not in _GENDER_PATTERNS:
+        return True
+    other = "female" if gender == "male" else "male"
+    if _GENDER_PATTERNS[gender].search(title or ""):
+        return True
+    return not _GENDER_PATTERNS[other].search(title or "")
+
+
+def resolve_situation(situation: str) -> Optional[str]:
+    """Сопоставляет произвольное описание ситуации с тегом из SITUATION_KEYWORDS."""
+    text = (situation or "").strip().lower()
+    if text in SITUATION_KEYWORDS:
+        return text
+    for tag, keywords in SITUATION_KEYWORDS.items():
+        if tag in text or any(keyword in text for keyword in keywords):
+            return tag
+    return None
+
+
+def _pareto_front(prices: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Индексы Парето-фронта: по возрастанию цены, каждый следующий строго лучше по рейтингу."""
+    if prices.size == 0:
+        return np.empty(0, dtype=np.intp)
+    order = np.lexsort((-scores, prices))
+    ordered_scores = scores[order]
+    best_before = np.maximum.accumulate(ordered_scores)
+    keep = np.empty(order.size, dtype=bool)
+    keep[0] = True
+    keep[1:] = ordered_scores[1:] > best_before[:-1]
+    return order[keep]
+
+
+def solve_outfit(slot_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]], max_price: float) -> Optional[Dict]:
+    """Выбирает по одному товару на слот, максимизируя суммарный рейтинг в пределах бюджета.
+
+    Задача решается как multiple-choice knapsack: кандидаты каждого слота
+    сжимаются до Парето-фронта (цена, рейтинг), после чего фронты
+    последовательно объединяются векторизованной суммой с отсечением по бюджету.
+    Рейтинги переводятся в целые десятые, поэтому размер фронта ограничен
+    числом различных сумм рейтингов, а решение точное.
+    slot_arrays сопоставляет слоту пару массивов (цены, рейтинги); в ответе
+    для каждого слота возвращается позиция выбранного товара в этих массивах.
+    Возвращает None, если ни одна комбинация не укладывается в бюджет.
+    """
+    slots = [slot for slot, (prices, _) in slot_arrays.items() if len(prices)]
+    if not slots:
+        return None
+
+    total_prices = np.zeros(1)
+    total_scores = np.zeros(1, dtype=np.int64)
+    choices = np.empty((1, 0), dtype=np.intp)
+
+    for slot in slots:
+        prices = np.nan_to_num(np.asarray(slot_arrays[slot][0], dtype=float))
+        scores = np.rint(np.nan_to_num(np.asarray(slot_arrays[slot][1], dtype=float)) * 10).astype(np.int64)
+
+        affordable = np.flatnonzero(prices <= max_price)
+        front = affordable[_pareto_front(prices[affordable], scores[affordable])]
+        if front.size == 0:
+            return None
+
+        combined_prices = (total_prices[:, None] + prices[front][None, :]).ravel()
+        combined_scores = (total_scores[:, None] + scores[front][None, :]).ravel()
+        within_budget = np.flatnonzero(combined_prices <= max_price)
+        if within_budget.size == 0:
+            return None
+
+        kept = within_budget[_pareto_front(combined_prices[within_budget], combined_scores[within_budget])]
+        prev_idx, new_idx = np.divmod(kept, front.size)
+        choices = np.hstack([choices[prev_idx], front[new_idx][:, None]])
+        total_prices = combined_prices[kept]
+        total_scores = combined_scores[kept]
+
+    # Последний элемент фронта имеет максимальный рейтинг, а среди равных — минимальную цену
+    best = int(np.argmax(total_scores))
+    return {
+        "choices": {slot: int(choices[best, i]) for i, slot in enumerate(slots)},
+        "total_price": round(float(total_prices[best]), 2),
+        "total_rating": float(total_scores[best]) / 10,
+    }
+
+
+def optimize_outfit(candidates: Dict[str, Sequence[Dict]], max_price: float) -> Optional[Dict]:
+    """То же, что solve_outfit, но для списков строк-словарей с ключами price и rating."""
+    slot_arrays = {
+        slot: (
+            np.fromiter((item["price"] or 0.0 for item in items), dtype=float, count=len(items)),
+            np.fromiter((item["rating"] or 0.0 for item in items), dtype=float, count=len(items)),
+        )
+        for slot, items in candidates.items()
+    }
+    result = solve_outfit(slot_arrays, max_price)
+    if not result:
+        return None
+    return {
+        "outfit": {slot: candidates[slot][index] for slot, index in result.pop("choices").items()},
+        **result,
+    }
+
+
+def title_gender(title: str) -> str:
+    """Пол из названия товара: male, female или пустая строка, если он не указан однозначно."""
+    is_male = bool(_GENDER_PATTERNS["male"].search(title or ""))
+    is_female = bool(_GENDER_PATTERNS["female"].search(title or ""))
+    if is_male == is_female:
+        return ""
+    return "male" if is_male else "female"
+
+
+def group_candidates(rows: List[Dict], gender: str) -> Dict[str, List[Dict]]:
+    """Раскладывает строки товаров по слотам с учётом пола."""
+    grouped: Dict[str, List[Dict]] = {slot: [] for slot in SLOT_KEYWORDS}
+    for row in rows:
+        if not matches_gender(row["title"], gender):
+            continue
+        slot = classify_slot(row["title"])
+        if slot:
+            grouped[slot].append(row)
+    return grouped